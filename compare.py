@@ -3,27 +3,330 @@
 
 Usage:
     uv run compare.py <model_name> <reference_stl>
+    uv run compare.py --models <name|glob>... --scans <stl|glob>... [--jobs N] [--render]
+    (どちらも --max-memory 4G で巨大スキャンをストリーミング処理、--clean でスキャンの外れ値・浮遊片除去、--roi で切り出し、--decimate で間引き)
 
 Example:
     uv run compare.py saito-fa-125-engine scan/saito-fa-125-engine.stl
+    uv run compare.py --models 'saito*' --scans 'scan/*.stl' --jobs 4
 
 出力:
     out/<model_name>/compare_*.png    並列比較 (左:スキャン, 右:生成)
     out/<model_name>/overlay_*.png    半透明オーバーレイ (赤:スキャン, 青:生成)
     out/<model_name>/dimensions.txt   寸法差分レポート (Claude Code 向け)
+    out/.scan_cache/                  クリーンアップ済みスキャン (スキャンのハッシュ+設定ごと)
+    out/.render_cache/                レンダリングキャッシュ (メッシュ・ビュー・スタイルが同じなら再利用)
+
+バッチモード出力:
+    out/batch/matrix.csv              モデル × スキャンの平均偏差マトリクス
+    out/batch/pairs.csv               全ペアの寸法比・偏差指標
+    out/batch/matrix.json             上記をまとめた JSON
+    out/<model_name>/<scan>/          ペアごとの dimensions.txt (と --render 時の画像)
 """
 
 import os
 import sys
+import csv
+import glob
+import json
+import hashlib
+import argparse
 import importlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import pyvista as pv
+from scipy.spatial import cKDTree
 from build123d import export_stl, export_step
+import render_cache
+import stl_stream
+
+
+SCAN_CACHE_DIR = os.path.join("out", ".scan_cache")
+
+# 外れ値除去で一度に近傍探索する点数 (k=16 で距離+インデックス約 50MB)
+OUTLIER_QUERY_CHUNK = 200_000
+
+# --max-memory からの見積もり用 (1三角形あたりのバイト数の目安)
+IN_MEMORY_BYTES_PER_TRIANGLE = 200  # pv.read + アライメントのコピー + スライス
+STREAM_BYTES_PER_TRIANGLE = 512  # チャンク処理中の float64 配列と一時配列
+SAMPLE_BYTES_PER_TRIANGLE = 1024  # サンプルの PolyData・KD-tree・描画
+
+# 偏差計算で1メッシュあたりに打つ表面点の数
+N_SURFACE_SAMPLES = 100_000
+
+
+def load_reference(stl_path: str, cleanup: dict | None = None) -> pv.PolyData:
+    """参照メッシュ(フォトグラメトリSTL)を読み込む。cleanup 指定時はクリーンアップ済みを返す"""
+    if cleanup is None:
+        return pv.read(stl_path)
+    return load_cleaned_reference(stl_path, cleanup)
+
+
+def _triangles(mesh: pv.PolyData) -> tuple[np.ndarray, np.ndarray]:
+    """三角形メッシュの (点, 面インデックス) 配列"""
+    tri = mesh.triangulate()
+    return np.asarray(tri.points), tri.faces.reshape(-1, 4)[:, 1:]
+
+
+def _submesh(points: np.ndarray, faces: np.ndarray, face_mask: np.ndarray) -> pv.PolyData:
+    """残す面だけで PolyData を作り直す (参照されない点は詰める)"""
+    kept = faces[face_mask]
+    used, inverse = np.unique(kept, return_inverse=True)
+    new_faces = np.column_stack(
+        [np.full(len(kept), 3), inverse.reshape(-1, 3)]
+    ).ravel()
+    return pv.PolyData(points[used], new_faces)
+
+
+def crop_roi(mesh: pv.PolyData, roi: list[float]) -> pv.PolyData:
+    """重心が ROI (xmin, xmax, ymin, ymax, zmin, zmax) 内の面だけ残す"""
+    points, faces = _triangles(mesh)
+    lo = np.array(roi[0::2])
+    hi = np.array(roi[1::2])
+    centroids = points[faces].mean(axis=1)
+    inside = np.all((centroids >= lo) & (centroids <= hi), axis=1)
+    return _submesh(points, faces, inside)
+
+
+def outlier_mask(points: np.ndarray, k: int = 16, std_ratio: float = 2.0) -> np.ndarray:
+    """k 近傍平均距離が 平均+std_ratio*標準偏差 以下の点 (inlier) を True にする"""
+    k = min(k, len(points) - 1)
+    if k < 1:
+        return np.ones(len(points), dtype=bool)
+
+    # (点数, k+1) の距離配列を一度に作らないよう点をチャンクに分けて問い合わせる
+    tree = cKDTree(points)
+    mean_dist = np.empty(len(points))
+    for start in range(0, len(points), OUTLIER_QUERY_CHUNK):
+        stop = start + OUTLIER_QUERY_CHUNK
+        dist, _ = tree.query(points[start:stop], k=k + 1)
+        mean_dist[start:stop] = dist[:, 1:].mean(axis=1)  # 先頭は自分自身
+    return mean_dist <= mean_dist.mean() + std_ratio * mean_dist.std()
+
+
+def remove_outliers(mesh: pv.PolyData, k: int = 16, std_ratio: float = 2.0) -> pv.PolyData:
+    """統計的外れ値除去: 外れ値と判定された点を含む面を落とす"""
+    points, faces = _triangles(mesh)
+    inlier = outlier_mask(points, k, std_ratio)
+    return _submesh(points, faces, inlier[faces].all(axis=1))
+
+
+def label_components(n_points: int, faces: np.ndarray) -> np.ndarray:
+    """面配列上の union-find で点の連結成分ラベルを返す"""
+    u = np.concatenate([faces[:, 0], faces[:, 1], faces[:, 2]])
+    v = np.concatenate([faces[:, 1], faces[:, 2], faces[:, 0]])
+    return _union_find(n_points, u, v)
+
+
+def _union_find(n_points: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """辺 (u, v) の union-find (フック + ポインタジャンプをベクトル化) で連結成分ラベルを返す"""
+    labels = np.arange(n_points)
+    while True:
+        lu, lv = labels[u], labels[v]
+        diff = lu != lv
+        if not diff.any():
+            return labels
+        # 根同士を小さい方のラベルにつなぐ
+        lo = np.minimum(lu[diff], lv[diff])
+        np.minimum.at(labels, lu[diff], lo)
+        np.minimum.at(labels, lv[diff], lo)
+        # 経路圧縮
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def keep_largest_components(mesh: pv.PolyData, min_ratio: float = 0.1) -> pv.PolyData:
+    """最大成分の min_ratio 倍以上の面数を持つ連結成分だけ残す (浮遊片・ターンテーブル除去)"""
+    points, faces = _triangles(mesh)
+    if len(faces) == 0:
+        return mesh
+
+    face_labels = label_components(len(points), faces)[faces[:, 0]]
+    counts = np.bincount(face_labels, minlength=len(points))
+    keep = counts >= counts.max() * min_ratio
+    return _submesh(points, faces, keep[face_labels])
+
+
+def cluster_mask(points: np.ndarray, min_ratio: float = 0.1) -> np.ndarray:
+    """点群版の連結成分フィルタ (面のつながりがない表面点向け)
+
+    典型的な点間隔の3倍以内の点同士をつないだグラフの連結成分のうち、
+    最大成分の min_ratio 倍以上の点数を持つものを True にする。
+    表面点は面積比例で打っているので点数比は面積比 (≒ 面数比) になる。
+    """
+    if len(points) < 2:
+        return np.ones(len(points), dtype=bool)
+    tree = cKDTree(points)
+    dist, _ = tree.query(points, k=2)
+    radius = 3 * float(np.median(dist[:, 1]))
+    pairs = tree.query_pairs(radius, output_type="ndarray")
+    labels = _union_find(len(points), pairs[:, 0], pairs[:, 1])
+    counts = np.bincount(labels, minlength=len(points))
+    return counts[labels] >= counts.max() * min_ratio
+
+
+def clean_reference(mesh: pv.PolyData, cleanup: dict) -> pv.PolyData:
+    """スキャンの前処理: ROI 切り出し → 外れ値除去 → 連結成分フィルタ → 間引き"""
+    n_before = mesh.n_cells
+    if cleanup.get("roi"):
+        mesh = crop_roi(mesh, cleanup["roi"])
+    if cleanup.get("outlier_k"):
+        mesh = remove_outliers(mesh, cleanup["outlier_k"], cleanup["outlier_std"])
+    if cleanup.get("min_component"):
+        mesh = keep_largest_components(mesh, cleanup["min_component"])
+    if cleanup.get("decimate"):
+        mesh = mesh.triangulate().decimate(cleanup["decimate"])
+    print(f"Cleanup: {n_before} → {mesh.n_cells} faces")
+
+    if mesh.n_cells == 0:
+        print("Error: クリーンアップで面が全部消えてもうた。--roi 等の設定を見直してな")
+        sys.exit(1)
+    return mesh
+
+
+def file_digest(path: str) -> str:
+    """ファイル内容のハッシュ (チャンク単位で読む)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_cleaned_reference(stl_path: str, cleanup: dict) -> pv.PolyData:
+    """クリーンアップ済みスキャンをスキャンのハッシュと設定でキャッシュして返す"""
+    payload = json.dumps({"scan": file_digest(stl_path), **cleanup}, sort_keys=True)
+    key = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    cached = os.path.join(SCAN_CACHE_DIR, f"{key}.vtp")
+    if os.path.exists(cached):
+        print(f"Cached: {cached}")
+        return pv.read(cached)
+
+    mesh = clean_reference(pv.read(stl_path), cleanup)
+    os.makedirs(SCAN_CACHE_DIR, exist_ok=True)
+    mesh.save(cached)
+    print(f"Saved: {cached}")
+    return mesh
+
+
+def parse_size(text: str) -> int:
+    """'512M', '2G', '1.5G' のようなサイズ指定をバイト数にする"""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    text = text.strip().upper().removesuffix("B")
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"サイズの指定がおかしいで: {text}")
+
+
+def needs_streaming(stl_path: str, max_memory: int | None) -> bool:
+    """通常の読み込みで max_memory を超えそうならストリーミングにする"""
+    if max_memory is None:
+        return False
+    try:
+        n_tri = stl_stream.count_triangles(stl_path)
+    except ValueError as e:
+        print(f"Warning: {e}。ストリーミングせずに通常の読み込みを試すで")
+        return False
+    return n_tri * IN_MEMORY_BYTES_PER_TRIANGLE > max_memory
 
 
-def load_reference(stl_path: str) -> pv.PolyData:
-    """参照メッシュ(フォトグラメトリSTL)を読み込む"""
-    return pv.read(stl_path)
+def load_streamed_reference(
+    stl_path: str,
+    max_memory: int,
+    cleanup: dict | None = None,
+    n_samples: int = N_SURFACE_SAMPLES,
+) -> tuple[pv.PolyData, dict, np.ndarray]:
+    """巨大スキャンをチャンク単位で読む
+
+    (間引きメッシュ, スキャン全体の寸法情報, 全三角形から打った表面点) を返す。
+    """
+    chunk_size = max(1_000, max_memory // 8 // STREAM_BYTES_PER_TRIANGLE)
+    max_samples = max(10_000, max_memory // 2 // SAMPLE_BYTES_PER_TRIANGLE)
+    roi = cleanup.get("roi") if cleanup else None
+
+    def scan(roi):
+        try:
+            return stl_stream.scan_stl(
+                stl_path, chunk_size, max_samples, n_samples, roi=roi
+            )
+        except ValueError as e:
+            print(f"Error: {e}。--roi 等の設定を見直してな")
+            sys.exit(1)
+
+    print(f"Streaming reference: {chunk_size} triangles/chunk, ~{max_samples} samples")
+    dims, tris, points = scan(roi)
+
+    if cleanup and (cleanup.get("outlier_k") or cleanup.get("min_component")):
+        # 浮遊片・ターンテーブル片を除いた範囲で読み直し、BBox・寸法・断面・
+        # サンプルをすべてクリーンアップ後の形状から取る
+        roi = streamed_cleanup_roi(points, cleanup, roi)
+        print("Re-streaming reference within cleaned bounds...")
+        dims, tris, points = scan(roi)
+    if cleanup and cleanup.get("decimate"):
+        print("Note: ストリーミング時は三角形を間引きサンプルで扱うので --decimate はスキップ")
+    faces = np.column_stack(
+        [np.full(len(tris), 3), np.arange(3 * len(tris)).reshape(-1, 3)]
+    ).ravel()
+    sample = pv.PolyData(tris.reshape(-1, 3), faces).clean()
+    print(f"Sampled {sample.n_cells} of {dims['n_faces']} faces")
+    return sample, dims, points
+
+
+def streamed_cleanup_roi(
+    points: np.ndarray, cleanup: dict, roi: list[float] | None
+) -> list[float]:
+    """表面点に外れ値除去と連結成分フィルタをかけ、残った点の BBox を切り出し範囲にする
+
+    --roi 指定時はその範囲との共通部分を返す。
+    """
+    keep = np.ones(len(points), dtype=bool)
+    if cleanup.get("outlier_k"):
+        keep &= outlier_mask(points, cleanup["outlier_k"], cleanup["outlier_std"])
+    if cleanup.get("min_component"):
+        keep[keep] = cluster_mask(points[keep], cleanup["min_component"])
+    if not keep.any():
+        print("Error: クリーンアップで面が全部消えてもうた。--roi 等の設定を見直してな")
+        sys.exit(1)
+    print(f"Cleanup: {len(points)} → {int(keep.sum())} surface points")
+
+    kept = points[keep]
+    lo, hi = kept.min(axis=0), kept.max(axis=0)
+    pad = 0.01 * float(np.max(hi - lo))
+    crop = np.column_stack([lo - pad, hi + pad])
+    if roi is not None:
+        user = np.array(roi, dtype=float).reshape(3, 2)
+        crop = np.column_stack(
+            [np.maximum(crop[:, 0], user[:, 0]), np.minimum(crop[:, 1], user[:, 1])]
+        )
+    return [float(x) for x in crop.ravel()]
+
+
+def prepare_reference(
+    stl_path: str,
+    cleanup: dict | None = None,
+    max_memory: int | None = None,
+    n_samples: int = N_SURFACE_SAMPLES,
+) -> tuple[pv.PolyData, dict | None, np.ndarray | None]:
+    """参照メッシュを用意する
+
+    ストリーミング時はスキャン座標系の寸法情報と、全三角形から打った表面点も返す。
+    """
+    if needs_streaming(stl_path, max_memory):
+        return load_streamed_reference(stl_path, max_memory, cleanup, n_samples)
+    return load_reference(stl_path, cleanup), None, None
+
+
+def require_points(mesh: pv.PolyData, what: str):
+    """点も面もないメッシュ (読めない STL・空のモデル) はここで止める"""
+    if mesh.n_points == 0 or mesh.n_cells == 0:
+        print(f"Error: {what} のメッシュが空や (読めへんファイルか、形状がない)")
+        sys.exit(1)
 
 
 def load_generated(model_name: str) -> tuple[pv.PolyData, str]:
@@ -46,16 +349,39 @@ def load_generated(model_name: str) -> tuple[pv.PolyData, str]:
     return mesh, out_dir
 
 
-def align_meshes(reference: pv.PolyData, generated: pv.PolyData) -> pv.PolyData:
-    """参照メッシュを生成モデルの座標系にアライメント (BBox中心+スケール)"""
-    ref_center = np.array(reference.center)
+def alignment_transform(
+    reference: pv.PolyData, generated: pv.PolyData, ref_dims: dict | None = None
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """参照→生成の相似変換 (参照中心, 生成中心, スケール) を求める
+
+    ref_dims (スキャン座標系の寸法情報) があればその BBox を使う。
+    ストリーミング時は間引きメッシュではなくスキャン全体の BBox になる。
+    """
+    if ref_dims is not None:
+        ref_center = np.array(ref_dims["center"])
+        ref_bounds = np.array(ref_dims["bounds"])
+    else:
+        ref_center = np.array(reference.center)
+        ref_bounds = np.array(reference.bounds).reshape(3, 2)
     gen_center = np.array(generated.center)
 
-    ref_bounds = np.array(reference.bounds).reshape(3, 2)
     gen_bounds = np.array(generated.bounds).reshape(3, 2)
     ref_size = np.max(ref_bounds[:, 1] - ref_bounds[:, 0])
     gen_size = np.max(gen_bounds[:, 1] - gen_bounds[:, 0])
-    scale = gen_size / ref_size if ref_size > 0 else 1.0
+    scale = gen_size / ref_size if ref_size > 0 and gen_size > 0 else 1.0
+
+    return ref_center, gen_center, float(scale)
+
+
+def align_meshes(
+    reference: pv.PolyData,
+    generated: pv.PolyData,
+    transform: tuple[np.ndarray, np.ndarray, float] | None = None,
+) -> pv.PolyData:
+    """参照メッシュを生成モデルの座標系にアライメント (BBox中心+スケール)"""
+    if transform is None:
+        transform = alignment_transform(reference, generated)
+    ref_center, gen_center, scale = transform
 
     aligned = reference.copy()
     aligned.translate(-ref_center, inplace=True)
@@ -106,6 +432,84 @@ def extract_dimensions(mesh: pv.PolyData, name: str) -> dict:
     }
 
 
+def transform_dimensions(
+    dims: dict, transform: tuple[np.ndarray, np.ndarray, float]
+) -> dict:
+    """スキャン座標系の寸法情報をアライメント後の座標系に写す (ストリーミング時用)"""
+    ref_center, gen_center, scale = transform
+    bounds = (dims["bounds"] - ref_center[:, None]) * scale + gen_center[:, None]
+    return {
+        **dims,
+        "bounds": bounds,
+        "dimensions": dims["dimensions"] * scale,
+        "center": (dims["center"] - ref_center) * scale + gen_center,
+        "volume": dims["volume"] * scale**3 if dims["volume"] else dims["volume"],
+        "cross_sections": [
+            {
+                "z": (cs["z"] - ref_center[2]) * scale + gen_center[2],
+                "width_x": cs["width_x"] * scale,
+                "width_y": cs["width_y"] * scale,
+            }
+            for cs in dims["cross_sections"]
+        ],
+    }
+
+
+def sample_surface(mesh: pv.PolyData, n_samples: int, seed: int = 0) -> np.ndarray:
+    """面積重み付きで表面上の点を一様サンプリング (粗い三角形の生成メッシュ用)"""
+    tri = mesh.triangulate()
+    faces = tri.faces.reshape(-1, 4)[:, 1:]
+    v0, v1, v2 = (tri.points[faces[:, i]] for i in range(3))
+    areas = 0.5 * np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+    if len(areas) == 0 or areas.sum() <= 0:
+        return np.asarray(tri.points, dtype=float)
+
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(areas), size=n_samples, p=areas / areas.sum())
+    u = rng.random((n_samples, 1))
+    v = rng.random((n_samples, 1))
+    flip = (u + v) > 1
+    u = np.where(flip, 1 - u, u)
+    v = np.where(flip, 1 - v, v)
+    return v0[idx] + u * (v1[idx] - v0[idx]) + v * (v2[idx] - v0[idx])
+
+
+def build_index(points: np.ndarray) -> cKDTree:
+    """最近傍探索用の KD-tree を構築"""
+    return cKDTree(np.asarray(points, dtype=float))
+
+
+def compute_deviation(
+    ref_points: np.ndarray,
+    ref_index: cKDTree,
+    gen_points: np.ndarray,
+    gen_index: cKDTree,
+    transform: tuple[np.ndarray, np.ndarray, float],
+) -> dict:
+    """双方向の最近傍距離から表面偏差を求める (単位は生成モデル座標 = mm)
+
+    インデックスは元の座標系のまま使い回し、問い合わせ点の側を相似変換する。
+    """
+    ref_center, gen_center, scale = transform
+
+    # 生成→スキャン: 生成点をスキャン座標に戻して問い合わせ、距離をスケール
+    d_gen, _ = ref_index.query((gen_points - gen_center) / scale + ref_center)
+    d_gen = d_gen * scale
+    # スキャン→生成: スキャン点を生成座標に変換して問い合わせ
+    d_ref, _ = gen_index.query((ref_points - ref_center) * scale + gen_center)
+
+    # 点数の多寡に引きずられないよう両方向を等しく重み付け
+    return {
+        "gen_to_scan_mean": float(d_gen.mean()),
+        "gen_to_scan_p95": float(np.percentile(d_gen, 95)),
+        "scan_to_gen_mean": float(d_ref.mean()),
+        "scan_to_gen_p95": float(np.percentile(d_ref, 95)),
+        "mean": float((d_gen.mean() + d_ref.mean()) / 2),
+        "rms": float(np.sqrt((np.mean(d_gen**2) + np.mean(d_ref**2)) / 2)),
+        "hausdorff": float(max(d_gen.max(), d_ref.max())),
+    }
+
+
 def set_view(plotter, view_type: str):
     """ビューを設定"""
     if view_type == "isometric":
@@ -121,59 +525,91 @@ def set_view(plotter, view_type: str):
 def render_comparison(
     reference: pv.PolyData, generated: pv.PolyData, out_dir: str
 ):
-    """並列レンダリングとオーバーレイレンダリング"""
+    """並列レンダリングとオーバーレイレンダリング (変更のないビューはキャッシュを再利用)"""
     views = {
         "isometric": "isometric",
         "front": "xz",
         "side": "yz",
         "top": "xy",
     }
+    digests = [
+        render_cache.mesh_digest(reference),
+        render_cache.mesh_digest(generated),
+    ]
 
     for view_name, view_type in views.items():
         # --- 並列比較 (左右) ---
-        pl = pv.Plotter(
-            off_screen=True, shape=(1, 2), window_size=(1600, 800)
+        path = os.path.join(out_dir, f"compare_{view_name}.png")
+        key = render_cache.render_key(
+            digests,
+            kind="compare",
+            view=view_type,
+            window_size=(1600, 800),
+            colors=("coral", "lightblue"),
+            opacity=(1.0, 1.0),
+            smooth_shading=True,
+            labels=("Reference (Scan)", "Generated (STEP)"),
         )
+        if not render_cache.fetch(key, path):
+            pl = pv.Plotter(
+                off_screen=True, shape=(1, 2), window_size=(1600, 800)
+            )
 
-        pl.subplot(0, 0)
-        pl.add_mesh(reference, color="coral", smooth_shading=True)
-        pl.add_text("Reference (Scan)", font_size=12)
+            pl.subplot(0, 0)
+            pl.add_mesh(reference, color="coral", smooth_shading=True)
+            pl.add_text("Reference (Scan)", font_size=12)
 
-        pl.subplot(0, 1)
-        pl.add_mesh(generated, color="lightblue", smooth_shading=True)
-        pl.add_text("Generated (STEP)", font_size=12)
+            pl.subplot(0, 1)
+            pl.add_mesh(generated, color="lightblue", smooth_shading=True)
+            pl.add_text("Generated (STEP)", font_size=12)
 
-        pl.link_views()
-        for i in range(2):
-            pl.subplot(0, i)
-            set_view(pl, view_type)
+            pl.link_views()
+            for i in range(2):
+                pl.subplot(0, i)
+                set_view(pl, view_type)
 
-        pl.render()
-        path = os.path.join(out_dir, f"compare_{view_name}.png")
-        pl.screenshot(path)
-        pl.close()
-        print(f"Saved: {path}")
+            pl.render()
+            render_cache.screenshot(pl, path, key)
+            pl.close()
+            print(f"Saved: {path}")
 
         # --- オーバーレイ (半透明重ね合わせ) ---
-        pl2 = pv.Plotter(off_screen=True, window_size=(800, 800))
-        pl2.add_mesh(
-            reference, color="coral", opacity=0.45, smooth_shading=True,
-            label="Scan",
-        )
-        pl2.add_mesh(
-            generated, color="lightblue", opacity=0.45, smooth_shading=True,
-            label="STEP",
-        )
-        pl2.add_legend()
-        set_view(pl2, view_type)
-        pl2.render()
         path2 = os.path.join(out_dir, f"overlay_{view_name}.png")
-        pl2.screenshot(path2)
-        pl2.close()
-        print(f"Saved: {path2}")
+        key2 = render_cache.render_key(
+            digests,
+            kind="overlay",
+            view=view_type,
+            window_size=(800, 800),
+            colors=("coral", "lightblue"),
+            opacity=(0.45, 0.45),
+            smooth_shading=True,
+            legend=("Scan", "STEP"),
+        )
+        if not render_cache.fetch(key2, path2):
+            pl2 = pv.Plotter(off_screen=True, window_size=(800, 800))
+            pl2.add_mesh(
+                reference, color="coral", opacity=0.45, smooth_shading=True,
+                label="Scan",
+            )
+            pl2.add_mesh(
+                generated, color="lightblue", opacity=0.45, smooth_shading=True,
+                label="STEP",
+            )
+            pl2.add_legend()
+            set_view(pl2, view_type)
+            pl2.render()
+            render_cache.screenshot(pl2, path2, key2)
+            pl2.close()
+            print(f"Saved: {path2}")
 
 
-def write_dimension_report(ref_dims: dict, gen_dims: dict, out_dir: str):
+def write_dimension_report(
+    ref_dims: dict,
+    gen_dims: dict,
+    out_dir: str,
+    deviation: dict | None = None,
+    echo: bool = True,
+):
     """寸法差分レポート (Claude Code がこのテキストを読んで改善する)"""
     lines = []
     lines.append("=" * 70)
@@ -230,6 +666,23 @@ def write_dimension_report(ref_dims: dict, gen_dims: dict, out_dir: str):
                 f"{dy:+7.2f}"
             )
 
+    # 表面偏差 (バッチモードで計算される)
+    if deviation:
+        lines.append("")
+        lines.append("--- 表面偏差 (最近傍距離, mm) ---")
+        lines.append(
+            f"{'生成→スキャン':20s} 平均 {deviation['gen_to_scan_mean']:8.2f}  "
+            f"P95 {deviation['gen_to_scan_p95']:8.2f}"
+        )
+        lines.append(
+            f"{'スキャン→生成':20s} 平均 {deviation['scan_to_gen_mean']:8.2f}  "
+            f"P95 {deviation['scan_to_gen_p95']:8.2f}"
+        )
+        lines.append(
+            f"{'双方向':20s} 平均 {deviation['mean']:8.2f}  "
+            f"RMS {deviation['rms']:8.2f}  Hausdorff {deviation['hausdorff']:8.2f}"
+        )
+
     # Claude Code 向けサマリー
     lines.append("")
     lines.append("--- 修正アクション候補 ---")
@@ -251,20 +704,369 @@ def write_dimension_report(ref_dims: dict, gen_dims: dict, out_dir: str):
     with open(path, "w") as f:
         f.write(report)
 
-    print(report)
-    print(f"\nSaved: {path}")
+    if echo:
+        print(report)
+        print(f"\nSaved: {path}")
+
+
+def has_generate(model_name: str) -> bool:
+    """model/<model_name>.py が generate() を持っているか"""
+    module = importlib.import_module(f"model.{model_name}")
+    return hasattr(module, "generate")
+
+
+def expand_models(patterns: list[str]) -> list[str]:
+    """モデル名 (glob 可) を model/*.py に照らして展開
+
+    glob に一致したもののうち generate() のないモジュールは警告して飛ばす。
+    名前を直接指定した場合はエラーにする。
+    """
+    names = []
+    for pattern in patterns:
+        is_glob = any(c in pattern for c in "*?[")
+        matches = sorted(glob.glob(os.path.join("model", f"{pattern}.py")))
+        if not matches:
+            print(f"Error: model/{pattern}.py に一致するモデルがあらへん")
+            sys.exit(1)
+        for m in matches:
+            name = os.path.splitext(os.path.basename(m))[0]
+            if name in names:
+                continue
+            if not has_generate(name):
+                if not is_glob:
+                    print(f"Error: {name}.py に generate() 関数がないで。")
+                    sys.exit(1)
+                print(f"Warning: {name}.py に generate() 関数がないから飛ばすで。")
+                continue
+            names.append(name)
+    if not names:
+        print("Error: generate() を持つモデルが1つもあらへん")
+        sys.exit(1)
+    return names
+
+
+def expand_scans(patterns: list[str]) -> list[str]:
+    """スキャン STL のパス (glob 可) を展開"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            print(f"Error: {pattern} に一致する STL が見つからへん")
+            sys.exit(1)
+        for m in matches:
+            if m not in paths:
+                paths.append(m)
+    return paths
+
+
+def scan_labels(paths: list[str]) -> list[str]:
+    """スキャンの出力ディレクトリ名 (ファイル名、重複時は連番付き)"""
+    labels = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        label, n = stem, 2
+        while label in labels:
+            label = f"{stem}_{n}"
+            n += 1
+        labels.append(label)
+    return labels
+
+
+def compare_pair(
+    model: dict, scan: dict, render: bool = False
+) -> tuple[dict, pv.PolyData | None]:
+    """1ペアの比較 (ワーカースレッドで実行)。メッシュとインデックスは共有・読み取り専用
+
+    スキャンの寸法情報は1回だけ抽出済みのものを相似変換で写す。
+    アライメント済みメッシュのコピーは render 時だけ作って返す。
+    """
+    generated = model["mesh"]
+    transform = alignment_transform(scan["mesh"], generated, scan["dims"])
+    ref_dims = transform_dimensions(scan["dims"], transform)
+    aligned = align_meshes(scan["mesh"], generated, transform) if render else None
+    gen_dims = model["dims"]
+    deviation = compute_deviation(
+        scan["points"], scan["index"], model["points"], model["index"], transform
+    )
+
+    pair_dir = os.path.join("out", model["name"], scan["label"])
+    os.makedirs(pair_dir, exist_ok=True)
+    write_dimension_report(ref_dims, gen_dims, pair_dir, deviation, echo=False)
+
+    rd, gd = ref_dims["dimensions"], gen_dims["dimensions"]
+    rv, gv = ref_dims["volume"], gen_dims["volume"]
+    row = {
+        "model": model["name"],
+        "scan": scan["label"],
+        "scan_path": scan["path"],
+        "scale": transform[2],
+        "ratio_x": float(gd[0] / rd[0]) if rd[0] > 0 else None,
+        "ratio_y": float(gd[1] / rd[1]) if rd[1] > 0 else None,
+        "ratio_z": float(gd[2] / rd[2]) if rd[2] > 0 else None,
+        "volume_ratio": gv / rv if rv and gv else None,
+        **deviation,
+    }
+    return row, aligned
+
+
+def write_batch_matrix(
+    rows: list[dict], models: list[str], scans: list[str], out_dir: str
+):
+    """比較マトリクス (平均偏差) と全ペアの指標を CSV/JSON で保存"""
+    os.makedirs(out_dir, exist_ok=True)
+    by_pair = {(r["model"], r["scan"]): r for r in rows}
+
+    path = os.path.join(out_dir, "matrix.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["model"] + scans)
+        for m in models:
+            writer.writerow([m] + [f"{by_pair[(m, s)]['mean']:.4f}" for s in scans])
+    print(f"Saved: {path}")
+
+    path = os.path.join(out_dir, "pairs.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for m in models:
+            for s in scans:
+                writer.writerow(by_pair[(m, s)])
+    print(f"Saved: {path}")
+
+    path = os.path.join(out_dir, "matrix.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "models": models,
+                "scans": scans,
+                "mean_deviation": [[by_pair[(m, s)]["mean"] for s in scans] for m in models],
+                "pairs": [by_pair[(m, s)] for m in models for s in scans],
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"Saved: {path}")
+
+
+def run_batch(
+    model_patterns: list[str],
+    scan_patterns: list[str],
+    jobs: int | None = None,
+    render: bool = False,
+    n_samples: int = N_SURFACE_SAMPLES,
+    cleanup: dict | None = None,
+    max_memory: int | None = None,
+):
+    """多対多の比較。各メッシュ・インデックスは1回だけ構築して全ペアで共有する"""
+    model_names = expand_models(model_patterns)
+    scan_paths = expand_scans(scan_patterns)
+    labels = scan_labels(scan_paths)
+
+    # 1. スキャン: 読み込み・寸法・表面サンプル・インデックスを1回ずつ (空なら生成前に止める)
+    scans = []
+    for path, label in zip(scan_paths, labels):
+        print(f"Loading reference: {path}")
+        mesh, stream_dims, points = prepare_reference(
+            path, cleanup, max_memory, n_samples
+        )
+        require_points(mesh, path)
+        if stream_dims is None:
+            stream_dims = extract_dimensions(mesh, "Reference (Scan)")
+        if points is None:
+            # 頂点の粗密に結果が左右されないよう、生成モデル側と同じく表面を一様サンプリング
+            points = sample_surface(mesh, n_samples)
+        scans.append(
+            {
+                "path": path,
+                "label": label,
+                "mesh": mesh,
+                "dims": stream_dims,
+                "points": points,
+                "index": build_index(points),
+            }
+        )
+
+    # 2. 生成モデル: メッシュ化・寸法・表面サンプル・インデックスを1回ずつ
+    models = []
+    for name in model_names:
+        print(f"Generating model: {name}")
+        mesh, _ = load_generated(name)
+        require_points(mesh, f"model/{name}.py")
+        points = sample_surface(mesh, n_samples)
+        models.append(
+            {
+                "name": name,
+                "mesh": mesh,
+                "dims": extract_dimensions(mesh, "Generated (STEP)"),
+                "points": points,
+                "index": build_index(points),
+            }
+        )
+
+    # 3. 全ペアをワーカープールで評価 (レンダリングは VTK の都合でメインスレッド)
+    n_pairs = len(models) * len(scans)
+    print(f"Comparing {len(models)} model(s) x {len(scans)} scan(s) = {n_pairs} pair(s)...")
+    rows = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = {
+            pool.submit(compare_pair, model, scan, render): (model, scan)
+            for model in models
+            for scan in scans
+        }
+        for future in as_completed(list(pending)):
+            # 終わったペアの結果 (アライメント済みコピー) を抱え続けないよう手放す
+            model, scan = pending.pop(future)
+            row, aligned = future.result()
+            del future
+            rows.append(row)
+            print(
+                f"  {row['model']} vs {row['scan']}: "
+                f"mean {row['mean']:.2f} mm, hausdorff {row['hausdorff']:.2f} mm"
+            )
+            if aligned is not None:
+                pair_dir = os.path.join("out", model["name"], scan["label"])
+                render_comparison(aligned, model["mesh"], pair_dir)
+                del aligned
+
+    # 4. マトリクス出力
+    print("")
+    write_batch_matrix(rows, model_names, labels, os.path.join("out", "batch"))
+
+    print("\nDone!")
+
+
+def positive_int(text: str) -> int:
+    """1 以上の整数 (argparse 用)"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数を指定してな: {text}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"1 以上を指定してな: {text}")
+    return value
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="フォトグラメトリ STL と build123d 生成モデルの比較"
+    )
+    parser.add_argument("model_name", nargs="?", help="model/<model_name>.py")
+    parser.add_argument("reference_stl", nargs="?", help="参照 STL のパス")
+    parser.add_argument(
+        "--models", nargs="+", metavar="NAME", help="バッチモード: モデル名 (glob 可)"
+    )
+    parser.add_argument(
+        "--scans", nargs="+", metavar="STL", help="バッチモード: スキャン STL (glob 可)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="バッチモードのワーカー数 (既定: min(32, CPU 数 + 4))",
+    )
+    parser.add_argument(
+        "--render", action="store_true", help="バッチモードでペアごとの画像も出力"
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="メモリ上限 (例: 4G)。超えそうなスキャンはチャンク単位のストリーミングで処理",
+    )
+
+    cleanup = parser.add_argument_group("スキャンのクリーンアップ (--clean で有効)")
+    cleanup.add_argument(
+        "--clean", action="store_true", help="比較前にスキャンをクリーンアップする"
+    )
+    cleanup.add_argument(
+        "--outlier-k", type=int, help="外れ値判定の近傍点数 (既定: 16, 0 で無効)"
+    )
+    cleanup.add_argument(
+        "--outlier-std", type=float, help="外れ値判定の標準偏差倍率 (既定: 2.0)"
+    )
+    cleanup.add_argument(
+        "--min-component",
+        type=float,
+        help="最大連結成分に対する面数比がこれ未満の成分を除去 (既定: 0.1, 0 で無効)",
+    )
+    cleanup.add_argument(
+        "--roi",
+        type=float,
+        nargs=6,
+        metavar=("XMIN", "XMAX", "YMIN", "YMAX", "ZMIN", "ZMAX"),
+        help="スキャン座標での切り出し範囲",
+    )
+    cleanup.add_argument(
+        "--decimate", type=float, help="間引き率 (0〜1, 既定: 0 = 無効)"
+    )
+    return parser.parse_args(argv)
+
+
+def cleanup_settings(args: argparse.Namespace) -> dict | None:
+    """コマンドライン引数からクリーンアップ設定を作る (キャッシュキーにも使う)"""
+    given = {
+        "roi": args.roi,
+        "outlier_k": args.outlier_k,
+        "outlier_std": args.outlier_std,
+        "min_component": args.min_component,
+        "decimate": args.decimate,
+    }
+    if not args.clean:
+        options = [
+            "--" + name.replace("_", "-")
+            for name, value in given.items()
+            if value is not None
+        ]
+        if options:
+            print(f"Error: {', '.join(options)} は --clean と一緒に指定してな")
+            sys.exit(1)
+        return None
+
+    defaults = {
+        "outlier_k": 16,
+        "outlier_std": 2.0,
+        "min_component": 0.1,
+        "decimate": 0.0,
+    }
+    return {
+        name: defaults.get(name) if value is None else value
+        for name, value in given.items()
+    }
 
 
 def main():
-    if len(sys.argv) < 3:
+    args = parse_args(sys.argv[1:])
+    cleanup = cleanup_settings(args)
+
+    if args.models or args.scans:
+        if not (args.models and args.scans):
+            print("Error: バッチモードには --models と --scans の両方が要るで")
+            sys.exit(1)
+        run_batch(
+            args.models,
+            args.scans,
+            jobs=args.jobs,
+            render=args.render,
+            cleanup=cleanup,
+            max_memory=args.max_memory,
+        )
+        return
+
+    if args.reference_stl is None:
         print("Usage: uv run compare.py <model_name> <reference_stl>")
         print(
             "Example: uv run compare.py saito-fa-125-engine scan/saito-fa-125-engine.stl"
         )
+        print(
+            "Batch:   uv run compare.py --models 'saito*' --scans 'scan/*.stl'"
+        )
         sys.exit(1)
 
-    model_name = sys.argv[1]
-    ref_stl_path = sys.argv[2]
+    model_name = args.model_name
+    ref_stl_path = args.reference_stl
 
     if not os.path.exists(ref_stl_path):
         print(f"Error: {ref_stl_path} が見つからへん")
@@ -272,18 +1074,24 @@ def main():
 
     # 1. 読み込み
     print(f"Loading reference: {ref_stl_path}")
-    reference = load_reference(ref_stl_path)
+    reference, stream_dims, _ = prepare_reference(ref_stl_path, cleanup, args.max_memory)
+    require_points(reference, ref_stl_path)
 
     print(f"Generating model: {model_name}")
     generated, out_dir = load_generated(model_name)
+    require_points(generated, f"model/{model_name}.py")
 
     # 2. アライメント (BBox中心+スケール合わせ)
     print("Aligning meshes...")
-    reference = align_meshes(reference, generated)
+    transform = alignment_transform(reference, generated, stream_dims)
+    reference = align_meshes(reference, generated, transform)
 
-    # 3. 寸法抽出
+    # 3. 寸法抽出 (ストリーミング時は読み込み中に集計済みの値を写すだけ)
     print("Extracting dimensions...")
-    ref_dims = extract_dimensions(reference, "Reference (Scan)")
+    if stream_dims is not None:
+        ref_dims = transform_dimensions(stream_dims, transform)
+    else:
+        ref_dims = extract_dimensions(reference, "Reference (Scan)")
     gen_dims = extract_dimensions(generated, "Generated (STEP)")
 
     # 4. 比較レンダリング
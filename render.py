@@ -3,6 +3,7 @@ import sys
 import importlib
 import pyvista as pv
 from build123d import export_stl, export_step
+import render_cache
 
 def render_model(model_name: str):
     # 1. モデルを動的にインポート
@@ -35,29 +36,47 @@ def render_model(model_name: str):
     export_stl(part, stl_path)
         
     print(f"Rendering to {out_dir}...")
-    plotter = pv.Plotter(off_screen=True)
     mesh = pv.read(stl_path)
-    plotter.add_mesh(mesh, color="lightblue", smooth_shading=True)
+    digest = render_cache.mesh_digest(mesh)
+    window_size = tuple(pv.global_theme.window_size)
+    plotter = None
     
-    views = [
-        ("isometric", None),
-        ("top", plotter.view_xy),
-        ("front", plotter.view_xz),
-        ("side", plotter.view_yz)
-    ]
+    views = ["isometric", "top", "front", "side"]
     
-    for view_name, view_func in views:
+    for view_name in views:
+        output_path = os.path.join(out_dir, f"{model_name}_{view_name}.png")
+        key = render_cache.render_key(
+            [digest],
+            kind="render",
+            view=view_name,
+            window_size=window_size,
+            colors=("lightblue",),
+            opacity=(1.0,),
+            smooth_shading=True,
+        )
+        if render_cache.fetch(key, output_path):
+            continue
+        
+        # キャッシュにないビューが出たときだけプロッタを作る
+        if plotter is None:
+            plotter = pv.Plotter(off_screen=True, window_size=window_size)
+            plotter.add_mesh(mesh, color="lightblue", smooth_shading=True)
+        
         if view_name == "isometric":
             plotter.view_isometric()
+        elif view_name == "top":
+            plotter.view_xy()
+        elif view_name == "front":
+            plotter.view_xz()
         else:
-            view_func()
+            plotter.view_yz()
             
         plotter.render()
-        output_path = os.path.join(out_dir, f"{model_name}_{view_name}.png")
-        plotter.screenshot(output_path)
+        render_cache.screenshot(plotter, output_path, key)
         print(f"Saved: {output_path}")
         
-    plotter.close()
+    if plotter is not None:
+        plotter.close()
     
     # 後片付け
     if os.path.exists(stl_path):
@@ -0,0 +1,80 @@
+"""
+レンダリング結果のキャッシュ (render.py / compare.py 共通)
+
+メッシュ配列のハッシュ・カメラ(ビュー)・ウィンドウサイズ・色・不透明度から
+キーを作り、同じキーの PNG が out/.render_cache/ にあれば再レンダリングせず
+ハードリンク (不可ならコピー) で出力先に置く。
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pyvista as pv
+
+CACHE_DIR = os.path.join("out", ".render_cache")
+
+# 描画コード (ラベル・ライティング・凡例等) を変えたら上げる。古いキャッシュは使われなくなる
+RENDER_VERSION = 1
+
+
+def mesh_digest(mesh: pv.PolyData) -> str:
+    """メッシュの点・面配列のハッシュ (ビューごとではなくメッシュごとに1回計算する)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(mesh.points).tobytes())
+    h.update(np.ascontiguousarray(mesh.faces).tobytes())
+    return h.hexdigest()
+
+
+def render_key(mesh_digests: list[str], **style) -> str:
+    """メッシュハッシュとカメラ・ウィンドウサイズ・色・不透明度等からキーを作る
+
+    style に渡せない描画コード自体の変更は RENDER_VERSION、テーマ変更は
+    pv.global_theme の内容でキーに反映する。
+    """
+    payload = json.dumps(
+        {
+            "meshes": mesh_digests,
+            "pyvista": pv.__version__,
+            "render_version": RENDER_VERSION,
+            "theme": pv.global_theme.to_dict(),
+            **style,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _place(src: str, dst: str):
+    """src を dst にハードリンク (別ファイルシステム等で不可ならコピー)"""
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def fetch(key: str, path: str) -> bool:
+    """キャッシュにあれば path に置いて True を返す"""
+    cached = os.path.join(CACHE_DIR, f"{key}.png")
+    if not os.path.exists(cached):
+        return False
+    _place(cached, path)
+    print(f"Cached: {path}")
+    return True
+
+
+def screenshot(plotter: pv.Plotter, path: str, key: str):
+    """スクリーンショットを保存してキャッシュに登録する"""
+    # キャッシュとハードリンクされた既存ファイルを上書きで壊さないよう先に消す
+    if os.path.exists(path):
+        os.remove(path)
+    plotter.screenshot(path)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _place(path, os.path.join(CACHE_DIR, f"{key}.png"))
@@ -0,0 +1,218 @@
+"""
+巨大 STL をメモリに載せずに扱うためのストリーミングリーダー (compare.py 用)
+
+三角形を固定サイズのチャンクで読み、BBox・体積・Z断面幅・三角形の間引きサンプルを
+ファイル全体を保持せずに集計する。バイナリ / ASCII の両方に対応。
+"""
+
+import os
+import numpy as np
+
+# バイナリ STL の1レコード (法線, 3頂点, 属性)
+_RECORD = np.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")]
+)
+
+# ASCII STL の1三角形あたりのおおよそのバイト数 (三角形数の見積もり用)
+_ASCII_BYTES_PER_TRIANGLE = 250
+
+
+def _binary_count(path: str) -> int:
+    """バイナリ STL の三角形数
+
+    ヘッダの値がファイルに収まればそれを使い (末尾の余りは無視)、
+    0 やファイルサイズと矛盾する値ならサイズから求める。
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(80)
+        n = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    if 0 < n and 84 + n * _RECORD.itemsize <= size:
+        return n
+    return (size - 84) // _RECORD.itemsize
+
+
+def is_binary_stl(path: str) -> bool:
+    """バイナリ STL なら True、ASCII STL なら False。どちらでもなければ ValueError"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(1024)
+    if size >= 84:
+        n = int(np.frombuffer(head[80:84], dtype="<u4")[0])
+        if size == 84 + n * _RECORD.itemsize:
+            return True
+    # ヘッダが "solid" で始まるバイナリもあるので中身まで見る
+    text_like = b"facet" in head or b"endsolid" in head
+    if head.lstrip().startswith(b"solid") and text_like:
+        return False
+    if size >= 84 + _RECORD.itemsize:
+        return True
+    raise ValueError(f"{path} はバイナリとしても ASCII としても STL に見えへん")
+
+
+def count_triangles(path: str) -> int:
+    """三角形数 (バイナリは正確、ASCII はファイルサイズからの見積もり)"""
+    if is_binary_stl(path):
+        return _binary_count(path)
+    return os.path.getsize(path) // _ASCII_BYTES_PER_TRIANGLE
+
+
+def _iter_binary(path: str, chunk_size: int):
+    remaining = _binary_count(path)
+    with open(path, "rb") as f:
+        f.seek(84)
+        while remaining > 0:
+            count = min(chunk_size, remaining)
+            records = np.fromfile(f, dtype=_RECORD, count=count)
+            if len(records) == 0:
+                return
+            remaining -= len(records)
+            yield records["vertices"].astype(np.float64)
+
+
+def _iter_ascii(path: str, chunk_size: int):
+    coords = []
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == "vertex":
+                coords.append(parts[1:4])
+                if len(coords) == 3 * chunk_size:
+                    yield np.array(coords, dtype=np.float64).reshape(-1, 3, 3)
+                    coords = []
+    n = len(coords) // 3 * 3
+    if n:
+        yield np.array(coords[:n], dtype=np.float64).reshape(-1, 3, 3)
+
+
+def iter_triangles(path: str, chunk_size: int, roi: list[float] | None = None):
+    """(n, 3, 3) の三角形配列をチャンクごとに返す。roi 指定時は重心が範囲内のものだけ"""
+    chunks = _iter_binary if is_binary_stl(path) else _iter_ascii
+    for tris in chunks(path, chunk_size):
+        if roi is not None:
+            centroids = tris.mean(axis=1)
+            inside = np.all(
+                (centroids >= roi[0::2]) & (centroids <= roi[1::2]), axis=1
+            )
+            tris = tris[inside]
+        if len(tris):
+            yield tris
+
+
+def _accumulate_sections(
+    tris: np.ndarray, zs: np.ndarray, lo: np.ndarray, hi: np.ndarray
+):
+    """各 Z 平面と三角形の辺の交点から断面の XY 範囲 (lo, hi) を更新する"""
+    tz = tris[:, :, 2]
+    tz_min = tz.min(axis=1)
+    tz_max = tz.max(axis=1)
+    for j, z in enumerate(zs):
+        t = tris[(tz_min <= z) & (tz_max >= z)]
+        if len(t) == 0:
+            continue
+        for a, b in ((0, 1), (1, 2), (2, 0)):
+            za, zb = t[:, a, 2], t[:, b, 2]
+            cross = ((za - z) * (zb - z) <= 0) & (za != zb)
+            if not cross.any():
+                continue
+            s = ((z - za[cross]) / (zb[cross] - za[cross]))[:, None]
+            pa, pb = t[cross, a, :2], t[cross, b, :2]
+            xy = pa + s * (pb - pa)
+            lo[j] = np.minimum(lo[j], xy.min(axis=0))
+            hi[j] = np.maximum(hi[j], xy.max(axis=0))
+
+
+def _triangle_areas(tris: np.ndarray) -> np.ndarray:
+    return 0.5 * np.linalg.norm(
+        np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]), axis=1
+    )
+
+
+def _sample_points(
+    tris: np.ndarray, counts: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    """各三角形上に counts 個ずつ一様な点を打つ"""
+    idx = np.repeat(np.arange(len(tris)), counts)
+    u = rng.random((len(idx), 1))
+    v = rng.random((len(idx), 1))
+    flip = (u + v) > 1
+    u = np.where(flip, 1 - u, u)
+    v = np.where(flip, 1 - v, v)
+    t = tris[idx]
+    return t[:, 0] + u * (t[:, 1] - t[:, 0]) + v * (t[:, 2] - t[:, 0])
+
+
+def scan_stl(
+    path: str,
+    chunk_size: int,
+    max_samples: int,
+    n_points: int = 100_000,
+    n_slices: int = 20,
+    roi: list[float] | None = None,
+    seed: int = 0,
+) -> tuple[dict, np.ndarray, np.ndarray]:
+    """STL をチャンク単位で2回走査して寸法情報・間引き三角形・表面点を返す
+
+    1回目で BBox・三角形数・体積・表面積、2回目で (BBox から決まる) Z断面幅と
+    max_samples 個程度の三角形サンプル、全三角形から面積比例で打った
+    n_points 個程度の表面点を集める。メモリ使用量はチャンクサイズと
+    サンプル数で決まり、ファイルサイズには依存しない。
+    表面点は三角形の間引き率に依らないので、偏差計算はこちらを使う。
+    寸法情報は compare.extract_dimensions と同じ形式 (スキャン座標系)。
+    """
+    # --- 1回目: BBox, 三角形数, 符号付き体積 ---
+    bmin = np.full(3, np.inf)
+    bmax = np.full(3, -np.inf)
+    n_tri = 0
+    volume = 0.0
+    area = 0.0
+    for tris in iter_triangles(path, chunk_size, roi):
+        pts = tris.reshape(-1, 3)
+        bmin = np.minimum(bmin, pts.min(axis=0))
+        bmax = np.maximum(bmax, pts.max(axis=0))
+        n_tri += len(tris)
+        volume += np.einsum(
+            "ij,ij->", tris[:, 0], np.cross(tris[:, 1], tris[:, 2])
+        ) / 6.0
+        area += _triangle_areas(tris).sum()
+    if n_tri == 0:
+        raise ValueError(f"{path} に三角形があらへん")
+
+    bounds = np.column_stack([bmin, bmax])
+    dims = bmax - bmin
+
+    # --- 2回目: Z断面 (extract_dimensions と同じ位置) と一様サンプル ---
+    zs = np.linspace(bmin[2] + dims[2] * 0.05, bmax[2] - dims[2] * 0.05, n_slices)
+    lo = np.full((n_slices, 2), np.inf)
+    hi = np.full((n_slices, 2), -np.inf)
+    rate = min(1.0, max_samples / n_tri)
+    rng = np.random.default_rng(seed)
+    density = n_points / area if area > 0 else 0.0
+    samples = []
+    points = []
+    for tris in iter_triangles(path, chunk_size, roi):
+        _accumulate_sections(tris, zs, lo, hi)
+        samples.append(tris[rng.random(len(tris)) < rate].astype(np.float32))
+        counts = rng.poisson(_triangle_areas(tris) * density)
+        points.append(_sample_points(tris, counts, rng))
+
+    cross_sections = [
+        {
+            "z": float(z),
+            "width_x": float(hi[j, 0] - lo[j, 0]),
+            "width_y": float(hi[j, 1] - lo[j, 1]),
+        }
+        for j, z in enumerate(zs)
+        if np.isfinite(lo[j, 0])
+    ]
+
+    summary = {
+        "name": "Reference (Scan)",
+        "bounds": bounds,
+        "dimensions": dims,
+        "center": (bmin + bmax) / 2,
+        "volume": abs(float(volume)),
+        "n_faces": n_tri,
+        "cross_sections": cross_sections,
+    }
+    return summary, np.concatenate(samples), np.concatenate(points)